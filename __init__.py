@@ -1,3 +1,3 @@
 from . import models
-# from . import controllers # If you add webhooks later
-# from . import wizards # If you add wizards
\ No newline at end of file
+from . import controllers
+from . import wizards
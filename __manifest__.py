@@ -7,10 +7,15 @@ Integrate Odoo with Mercury MES for shipping cost calculation and shipment booki
     'version': '1.0',
     'category': 'Inventory/Delivery',
     'author': 'Your Name/Company',
-    'depends': ['delivery', 'stock'], # Base modules needed
+    'depends': ['delivery', 'stock', 'sale_stock'], # Base modules needed
     'data': [
+        'security/ir.model.access.csv',
         'views/delivery_carrier_views.xml',
-        # 'data/mercury_mes_data.xml', # Optional
+        'views/mercury_mes_journal_views.xml',
+        'views/mercury_mes_rate_limit_views.xml',
+        'views/mercury_mes_batch_booking_views.xml',
+        'views/mercury_mes_reconciliation_views.xml',
+        'data/mercury_mes_data.xml',
     ],
     'installable': True,
     'application': False, # Set to True if it's a major app
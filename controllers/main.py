@@ -0,0 +1,38 @@
+# delivery_mercury_mes/controllers/main.py
+
+from odoo import api, http
+from odoo.http import request, content_disposition
+
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class MercuryMesController(http.Controller):
+
+    @http.route('/mercury_mes/reconciliation/export/<int:wizard_id>', type='http', auth='user')
+    def export_reconciliation(self, wizard_id, **kwargs):
+        wizard = request.env['mercury.mes.reconciliation.wizard'].browse(wizard_id).exists()
+        if not wizard:
+            return request.not_found()
+        wizard.check_access_rule('read')
+        file_format = wizard.file_format
+        headers = [
+            ('Content-Type', EXPORT_MIMETYPES[file_format]),
+            ('Content-Disposition', content_disposition(wizard._get_filename())),
+        ]
+        stream = self._stream_export(request.env.registry, request.env.uid, dict(request.env.context),
+                                     wizard_id, file_format)
+        return request.make_response(stream, headers=headers)
+
+    @staticmethod
+    def _stream_export(registry, uid, context, wizard_id, file_format):
+        # The request cursor is closed before the body is sent, so the
+        # generator reads through a cursor of its own.
+        with registry.cursor() as cr:
+            wizard = api.Environment(cr, uid, context)['mercury.mes.reconciliation.wizard'].browse(wizard_id)
+            if file_format == 'xlsx':
+                yield from wizard._stream_xlsx()
+            else:
+                yield from wizard._stream_csv()
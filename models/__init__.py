@@ -1,2 +1,7 @@
 from . import delivery_carrier
-from . import mercury_mes_service
\ No newline at end of file
+from . import mercury_mes_service
+from . import mercury_mes_journal
+from . import mercury_mes_rate_limit
+from . import mercury_mes_batch_booking
+from . import sale_order
+from . import stock_picking
\ No newline at end of file
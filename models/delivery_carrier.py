@@ -58,6 +58,9 @@ class DeliveryCarrier(models.Model):
             rate = service.get_freight_charge(self, order)
             if rate is not None:
                 _logger.info(f"Mercury MES Rate Shipment - Calculated Rate: {rate} ZMW for Order {order.name}")
+                # Keep the quote so it can be reconciled against the booked price
+                if order._origin:
+                    order._origin.mercury_mes_quoted_price = float(rate)
                 return {
                     'success': True,
                     'price': float(rate),
@@ -106,6 +109,7 @@ class DeliveryCarrier(models.Model):
 
                     waybills = res.get('waybills', [])
                     rate = res.get('rate', 0.0)
+                    picking._mercury_mes_record_booking(rate)
                     
                     if waybills:
                         waybill = waybills[0]  # Use the first waybill
@@ -0,0 +1,189 @@
+# delivery_mercury_mes/models/mercury_mes_batch_booking.py
+
+import logging
+import threading
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+from .mercury_mes_rate_limit import MercuryMesRateLimitExceeded
+
+_logger = logging.getLogger(__name__)
+
+
+class MercuryMesBatchBooking(models.Model):
+    """Bulk booking run over many pickings.
+
+    Pickings are booked one by one in savepoints and each result is
+    committed as soon as MES answers, so one bad address only fails its own
+    line and an interrupted run loses at most the booking in flight, whose
+    waybill is then recovered from the journal when MES answers the re-send
+    with a duplicate token.
+    """
+    _name = 'mercury.mes.batch.booking'
+    _description = 'Mercury MES Batch Booking'
+    _order = 'id desc'
+
+    name = fields.Char(string="Reference", required=True, readonly=True, copy=False, default=lambda self: _('New'))
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+    ], string="Status", default='draft', required=True, readonly=True, copy=False)
+    user_id = fields.Many2one('res.users', string="Started By", default=lambda self: self.env.user, readonly=True)
+    chunk_size = fields.Integer(string="Chunk Size", default=20,
+                                help="Number of pending pickings fetched at a time. Every picking is committed as soon as it is booked.")
+    date_start = fields.Datetime(string="Started On", readonly=True)
+    date_done = fields.Datetime(string="Finished On", readonly=True)
+    line_ids = fields.One2many('mercury.mes.batch.booking.line', 'batch_id', string="Pickings")
+    count_total = fields.Integer(compute='_compute_counts', string="Total")
+    count_pending = fields.Integer(compute='_compute_counts', string="Pending")
+    count_booked = fields.Integer(compute='_compute_counts', string="Booked")
+    count_failed = fields.Integer(compute='_compute_counts', string="Failed")
+    count_skipped = fields.Integer(compute='_compute_counts', string="Skipped")
+    progress = fields.Float(compute='_compute_counts', string="Progress")
+
+    @api.depends('line_ids.state')
+    def _compute_counts(self):
+        for batch in self:
+            counts = dict.fromkeys(('pending', 'booked', 'failed', 'skipped'), 0)
+            for line in batch.line_ids:
+                counts[line.state] += 1
+            total = len(batch.line_ids)
+            batch.count_total = total
+            batch.count_pending = counts['pending']
+            batch.count_booked = counts['booked']
+            batch.count_failed = counts['failed']
+            batch.count_skipped = counts['skipped']
+            batch.progress = 100.0 * (total - counts['pending']) / total if total else 0.0
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', _('New')) == _('New'):
+                vals['name'] = self.env['ir.sequence'].next_by_code('mercury.mes.batch.booking') or _('New')
+        return super().create(vals_list)
+
+    def action_start(self):
+        """Queue the run for the background worker."""
+        self.filtered(lambda b: b.state == 'draft').write({'state': 'running', 'date_start': fields.Datetime.now()})
+        self.env.ref('delivery_mercury_mes.ir_cron_mercury_mes_batch_booking')._trigger()
+        return True
+
+    def action_resume(self):
+        """Queue the remaining pending pickings for the background worker right away."""
+        self.filtered(lambda b: b.state == 'done' and b.count_pending).write({'state': 'running', 'date_done': False})
+        return self.action_start()
+
+    def action_reset_failed(self):
+        """Put failed lines back in the queue so the next run retries them."""
+        failed = self.line_ids.filtered(lambda l: l.state == 'failed')
+        if not failed:
+            raise UserError(_("There are no failed pickings to retry."))
+        failed.write({'state': 'pending', 'message': False})
+        self.filtered(lambda b: b.state == 'done').write({'state': 'running', 'date_done': False})
+        return True
+
+    @api.model
+    def _cron_process_batches(self):
+        for batch in self.search([('state', '=', 'running')], order='id'):
+            batch._process()
+
+    def _process(self):
+        """Book pending lines chunk by chunk, committing after every picking.
+
+        MES bookings cannot be undone, so each waybill is committed right
+        away instead of being held until the end of the chunk.
+        """
+        self.ensure_one()
+        Line = self.env['mercury.mes.batch.booking.line'].with_context(mercury_mes_priority='background')
+        chunk_size = max(1, self.chunk_size)
+        while True:
+            if not self._lock():
+                _logger.info(f"Mercury MES Batch {self.name} is being processed by another worker")
+                return False
+            lines = Line.search([('batch_id', '=', self.id), ('state', '=', 'pending')], limit=chunk_size, order='id')
+            if not lines:
+                break
+            for line in lines:
+                # Each commit releases the row lock; take it again before the next booking.
+                if not self._lock():
+                    _logger.info(f"Mercury MES Batch {self.name} is being processed by another worker")
+                    return False
+                self.env.invalidate_all()
+                if line.state != 'pending':
+                    continue
+                if not line._book():
+                    # MES is saturated: leave the run for a later cron pass.
+                    self._commit_progress()
+                    self.env.ref('delivery_mercury_mes.ir_cron_mercury_mes_batch_booking')._trigger(
+                        fields.Datetime.now() + timedelta(minutes=1))
+                    return False
+                self._commit_progress()
+            _logger.info(f"Mercury MES Batch {self.name}: {self.count_total - self.count_pending}/{self.count_total} pickings processed")
+        self.write({'state': 'done', 'date_done': fields.Datetime.now()})
+        self._commit_progress()
+        return True
+
+    def _lock(self):
+        """Take the row lock for this chunk; False if another worker holds it."""
+        self.env.cr.execute(
+            "SELECT id FROM mercury_mes_batch_booking WHERE id = %s FOR UPDATE SKIP LOCKED", [self.id])
+        return bool(self.env.cr.fetchone())
+
+    def _commit_progress(self):
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.commit()
+
+
+class MercuryMesBatchBookingLine(models.Model):
+    _name = 'mercury.mes.batch.booking.line'
+    _description = 'Mercury MES Batch Booking Line'
+    _order = 'id'
+
+    batch_id = fields.Many2one('mercury.mes.batch.booking', string="Batch", required=True, ondelete='cascade', index=True)
+    picking_id = fields.Many2one('stock.picking', string="Picking", required=True, ondelete='cascade')
+    state = fields.Selection([
+        ('pending', 'Pending'),
+        ('booked', 'Booked'),
+        ('failed', 'Failed'),
+        ('skipped', 'Skipped'),
+    ], string="Status", default='pending', required=True, index=True)
+    carrier_tracking_ref = fields.Char(string="Waybill", readonly=True)
+    message = fields.Char(string="Reason", readonly=True)
+
+    def _book(self):
+        """Book the line's picking; return False if the rate limiter kept it pending."""
+        self.ensure_one()
+        picking = self.picking_id
+        if picking.carrier_tracking_ref:
+            self.write({'state': 'skipped', 'carrier_tracking_ref': picking.carrier_tracking_ref,
+                        'message': _("Already has a tracking reference.")})
+            return True
+        if picking.state == 'cancel':
+            self.write({'state': 'skipped', 'message': _("Picking is cancelled.")})
+            return True
+        if picking.state == 'draft':
+            self.write({'state': 'skipped', 'message': _("Picking is not confirmed yet.")})
+            return True
+        if picking.picking_type_code != 'outgoing':
+            self.write({'state': 'skipped', 'message': _("Not an outgoing delivery.")})
+            return True
+        if picking.carrier_id.delivery_type != 'mercury_mes':
+            self.write({'state': 'skipped', 'message': _("Delivery method is not Mercury MES.")})
+            return True
+        try:
+            with self.env.cr.savepoint():
+                # Carrier credentials are restricted to system users, as in stock's own hook
+                picking.sudo().send_to_shipper()
+        except MercuryMesRateLimitExceeded as e:
+            _logger.info(f"Mercury MES Batch booking of Picking {picking.name} postponed: {e}")
+            return False
+        except Exception as e:
+            message = e.args[0] if isinstance(e, UserError) and e.args else str(e)
+            _logger.warning(f"Mercury MES Batch booking failed for Picking {picking.name}: {message}")
+            self.write({'state': 'failed', 'message': message[:255]})
+            return True
+        self.write({'state': 'booked', 'carrier_tracking_ref': picking.carrier_tracking_ref, 'message': False})
+        return True
@@ -0,0 +1,298 @@
+# delivery_mercury_mes/models/mercury_mes_journal.py
+
+import base64
+import json
+import logging
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+from odoo import models, fields, api, _
+
+from .mercury_mes_rate_limit import MercuryMesRateLimitExceeded
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_MAX_BOOKING_ATTEMPTS = 3
+DEFAULT_RETRY_BATCH_SIZE = 50
+PRUNE_BATCH_SIZE = 1000
+
+
+class MercuryMesJournal(models.Model):
+    _name = 'mercury.mes.journal'
+    _description = 'Mercury MES API Journal'
+    _order = 'id desc'
+    _rec_name = 'reference'
+
+    endpoint = fields.Selection([
+        ('bookcollection', 'Book Collection'),
+        ('getfreight', 'Get Freight'),
+    ], string="Endpoint", required=True, readonly=True, index=True)
+    token_no = fields.Char(string="Token No", readonly=True, index=True,
+                           help="Booking token sent to MES (the picking name).")
+    reference = fields.Char(string="Reference", readonly=True)
+    res_model = fields.Char(string="Document Model", readonly=True)
+    res_id = fields.Integer(string="Document ID", readonly=True)
+    carrier_id = fields.Many2one('delivery.carrier', string="Delivery Method", readonly=True, ondelete='set null')
+    request_payload = fields.Text(string="Request", readonly=True,
+                                  help="Request parameters with credentials redacted.")
+    response_payload = fields.Binary(string="Compressed Response", attachment=False, readonly=True)
+    response_text = fields.Text(string="Response", compute='_compute_response_text')
+    latency_ms = fields.Integer(string="Latency (ms)", readonly=True)
+    outcome = fields.Selection([
+        ('success', 'Success'),
+        ('failed', 'Failed'),
+        ('duplicate', 'Duplicate Token'),
+        ('ambiguous', 'Ambiguous'),
+    ], string="Outcome", required=True, readonly=True, index=True,
+        help="Ambiguous means MES may or may not have processed the request "
+             "(timeout, dropped connection or unreadable response).")
+    error_code = fields.Integer(string="MES Error Code", readonly=True)
+    error_message = fields.Char(string="Error Message", readonly=True)
+    retry_state = fields.Selection([
+        ('none', 'Not Needed'),
+        ('pending', 'Pending Retry'),
+        ('retried', 'Retried'),
+        ('resolved', 'Resolved'),
+        ('manual', 'Needs Manual Check'),
+        ('abandoned', 'Abandoned'),
+    ], string="Retry State", default='none', required=True, index=True)
+    retry_note = fields.Char(string="Retry Note")
+
+    @api.depends('response_payload')
+    def _compute_response_text(self):
+        for entry in self:
+            entry.response_text = entry._get_response_raw()
+
+    def _get_response_raw(self):
+        self.ensure_one()
+        if not self.response_payload:
+            return ''
+        try:
+            return zlib.decompress(base64.b64decode(self.response_payload)).decode('utf-8', 'replace')
+        except (ValueError, zlib.error):
+            return ''
+
+    def _get_response_json(self):
+        try:
+            return json.loads(self._get_response_raw() or '{}')
+        except json.JSONDecodeError:
+            return {}
+
+    # --- Recording ---
+
+    @api.model
+    def _redact_params(self, params):
+        """Return the request parameters as JSON with credentials masked."""
+        redacted = dict(params or {})
+        if 'private_key' in redacted:
+            redacted['private_key'] = '***REDACTED***'
+        return json.dumps(redacted, default=str)
+
+    @api.model
+    def _record_exchange(self, endpoint, params, response, started, outcome,
+                         carrier=None, record=None, token_no=False,
+                         error_code=False, error_message=False):
+        """Journal one MES exchange in its own transaction.
+
+        The entry is committed independently so that it survives the
+        rollback of the calling transaction (e.g. a failed booking raising
+        ``UserError``). Journaling must never break shipping, so any error
+        here is only logged.
+        """
+        latency_ms = int((time.monotonic() - started) * 1000)
+        response_raw = response.text if response is not None else ''
+        if endpoint == 'bookcollection' and outcome != 'success':
+            # Duplicates stay pending too: an earlier success may hold the waybill.
+            retry_state = 'pending'
+        else:
+            retry_state = 'none'
+        vals = {
+            'endpoint': endpoint,
+            'token_no': token_no or False,
+            'reference': record.display_name if record else token_no,
+            'res_model': record._name if record else False,
+            'res_id': (getattr(record.id, 'origin', record.id) or 0) if record else 0,
+            'carrier_id': carrier.id if carrier else False,
+            'request_payload': self._redact_params(params),
+            'response_payload': base64.b64encode(zlib.compress(response_raw.encode('utf-8'))) if response_raw else False,
+            'latency_ms': latency_ms,
+            'outcome': outcome,
+            'error_code': error_code or 0,
+            'error_message': (str(error_message)[:255]) if error_message else False,
+            'retry_state': retry_state,
+        }
+        try:
+            with self.env.registry.cursor() as cr:
+                self.env(cr=cr, su=True)[self._name].create(vals)
+        except Exception as e:
+            _logger.warning(f"Mercury MES Journal: could not record {endpoint} exchange for {vals['reference']}: {e}")
+
+    @api.model
+    def _get_journaled_booking(self, token_no):
+        """Return the waybill of the latest successful booking of ``token_no``.
+
+        Reads through a fresh cursor, so successes journaled after the
+        current transaction started are visible. Returns a ``book_shipment``
+        style dict, or None when no success with a waybill is on record.
+        """
+        if not token_no:
+            return None
+        with self.env.registry.cursor() as cr:
+            success = self.env(cr=cr, su=True)[self._name].search([
+                ('endpoint', '=', 'bookcollection'),
+                ('token_no', '=', token_no),
+                ('outcome', '=', 'success'),
+            ], limit=1)
+            response = success._get_response_json() if success else {}
+        waybills = response.get('waybill') or []
+        if not waybills:
+            return None
+        return {'rate': float(response.get('rate') or 0.0), 'waybills': [waybills[0]]}
+
+    # --- Retention ---
+
+    @api.model
+    def _cron_prune_journal(self):
+        """Delete settled journal entries older than the retention period."""
+        retention_days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'delivery_mercury_mes.journal_retention_days', DEFAULT_RETENTION_DAYS))
+        if retention_days <= 0:
+            return
+        cutoff = fields.Datetime.now() - timedelta(days=retention_days)
+        domain = [('create_date', '<', cutoff), ('retry_state', 'not in', ('pending', 'manual'))]
+        total = 0
+        while True:
+            entries = self.search(domain, limit=PRUNE_BATCH_SIZE)
+            if not entries:
+                break
+            total += len(entries)
+            entries.unlink()
+            self._commit_progress()
+        _logger.info(f"Mercury MES Journal: pruned {total} entries older than {retention_days} days")
+
+    # --- Retry engine ---
+
+    @api.model
+    def _cron_retry_failed_bookings(self):
+        self.with_context(mercury_mes_priority='background')._retry_failed_bookings()
+
+    def action_retry_failed_bookings(self):
+        """Reconcile and retry the selected bookings right away."""
+        self._retry_failed_bookings()
+
+    def _retry_failed_bookings(self):
+        """Reconcile pending bookings by ``token_no`` and re-send the real failures.
+
+        Every pending token is first checked against what we already know:
+        the picking may have been booked since, or may no longer be ready to
+        ship. The rest is re-sent through ``send_to_shipper`` in batches with
+        a commit after each batch. MES rejects a token it already knows with
+        code 515, so a re-send can never create a second shipment. When an
+        earlier exchange succeeded in MES but its Odoo transaction rolled
+        back, ``book_shipment`` answers that 515 with the journaled waybill,
+        so the recovered picking gets the usual margin and delivery line
+        processing. A 515 with no journaled waybill is flagged for a manual
+        check.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_attempts = int(ICP.get_param('delivery_mercury_mes.max_booking_attempts', DEFAULT_MAX_BOOKING_ATTEMPTS))
+        batch_size = int(ICP.get_param('delivery_mercury_mes.retry_batch_size', DEFAULT_RETRY_BATCH_SIZE))
+
+        domain = [('endpoint', '=', 'bookcollection'), ('retry_state', '=', 'pending')]
+        if self:
+            domain.append(('id', 'in', self.ids))
+        pending = self.search(domain)
+        by_token = {}
+        for entry in pending:
+            by_token.setdefault(entry.token_no, self.browse())
+            by_token[entry.token_no] |= entry
+
+        to_resend = []
+        for token_no, entries in by_token.items():
+            picking = self._get_booking_picking(entries[0])
+            if picking is None:
+                continue
+            if self._reconcile_booking(token_no, entries, picking, max_attempts):
+                to_resend.append((picking, entries))
+        self._commit_progress()
+
+        for start in range(0, len(to_resend), batch_size):
+            for picking, entries in to_resend[start:start + batch_size]:
+                entries.write({'retry_state': 'retried', 'retry_note': False})
+                try:
+                    with self.env.cr.savepoint():
+                        # Carrier credentials are restricted to system users, as in stock's own hook
+                        picking.sudo().send_to_shipper()
+                    entries.write({
+                        'retry_state': 'resolved',
+                        'retry_note': _("Booked with waybill %s.") % picking.carrier_tracking_ref,
+                    })
+                    _logger.info(f"Mercury MES Retry: booked {picking.name} with waybill {picking.carrier_tracking_ref}")
+                except MercuryMesRateLimitExceeded:
+                    # Nothing reached MES: keep the rest of the queue for the next run.
+                    entries.write({'retry_state': 'pending'})
+                    _logger.info("Mercury MES Retry: API is busy, postponing the remaining bookings")
+                    self._commit_progress()
+                    return False
+                except Exception as e:
+                    # The new attempt is journaled by the service and picked up on the next run.
+                    _logger.warning(f"Mercury MES Retry: re-sending {picking.name} failed: {e}")
+            self._commit_progress()
+        return True
+
+    def _get_booking_picking(self, entry):
+        """Return the picking behind a journal entry, abandoning the token if it is gone."""
+        picking = self.env['stock.picking']
+        if entry.res_model == 'stock.picking' and entry.res_id:
+            picking = picking.browse(entry.res_id).exists()
+        if not picking:
+            picking = picking.search([('name', '=', entry.token_no)], limit=1)
+        if not picking or picking.state == 'cancel':
+            self._set_token_state(entry.token_no, 'abandoned', _("Picking no longer exists or is cancelled."))
+            return None
+        return picking
+
+    def _reconcile_booking(self, token_no, entries, picking, max_attempts):
+        """Settle a pending token from known facts; return True if it must be re-sent."""
+        if picking.carrier_tracking_ref:
+            self._set_token_state(token_no, 'resolved', _("Picking already has tracking reference %s.") % picking.carrier_tracking_ref)
+            return False
+
+        if picking.carrier_id.delivery_type != 'mercury_mes':
+            self._set_token_state(token_no, 'abandoned', _("Picking no longer ships with Mercury MES."))
+            return False
+        if picking.state == 'draft':
+            # Same rule as bulk booking: a failed validation leaves the picking
+            # ready or waiting, and those are re-sent without a new validation.
+            note = _("Waiting for the picking to be confirmed.")
+            entries.filtered(lambda e: e.retry_note != note).write({'retry_note': note})
+            return False
+        if self._get_journaled_booking(token_no):
+            # Re-sending gets a 515, which book_shipment resolves to the journaled waybill.
+            return True
+
+        history = self.search([('endpoint', '=', 'bookcollection'), ('token_no', '=', token_no)], order='id desc')
+        if history.filtered(lambda h: h.outcome == 'success'):
+            self._set_token_state(token_no, 'manual', _("MES accepted the booking but returned no waybill."))
+            return False
+        if history.filtered(lambda h: h.outcome == 'duplicate'):
+            self._set_token_state(token_no, 'manual', _("MES already holds a shipment for this token."))
+            return False
+        if len(history) >= max_attempts:
+            self._set_token_state(token_no, 'manual', _("Gave up after %s attempts.") % len(history))
+            return False
+        return True
+
+    def _set_token_state(self, token_no, state, note):
+        self.search([
+            ('endpoint', '=', 'bookcollection'),
+            ('token_no', '=', token_no),
+            ('retry_state', 'in', ('pending', 'manual')),
+        ]).write({'retry_state': state, 'retry_note': note})
+
+    def _commit_progress(self):
+        if not getattr(threading.current_thread(), 'testing', False):
+            self.env.cr.commit()
@@ -0,0 +1,106 @@
+# delivery_mercury_mes/models/mercury_mes_rate_limit.py
+
+import logging
+import time
+
+from psycopg2.errors import SerializationFailure
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+
+class MercuryMesRateLimitExceeded(UserError):
+    """No token became available in time; the request was never sent to MES."""
+
+
+class MercuryMesRateLimit(models.Model):
+    """Token bucket shared by every worker through a row in the database.
+
+    Each outbound MES call takes one token from the bucket of its traffic
+    class. Tokens refill continuously at ``refill_rate`` per second up to
+    ``capacity``. Background callers (crons, bulk jobs - flagged with the
+    ``mercury_mes_priority='background'`` context key) may not dip below
+    ``background_reserve``, which keeps headroom for interactive users.
+    """
+    _name = 'mercury.mes.rate.limit'
+    _description = 'Mercury MES API Rate Limit'
+    _order = 'bucket'
+    _rec_name = 'bucket'
+
+    bucket = fields.Selection([
+        ('rating', 'Interactive Rating'),
+        ('booking', 'Booking'),
+        ('tracking', 'Tracking'),
+    ], string="Traffic Class", required=True)
+    active = fields.Boolean(default=True)
+    capacity = fields.Float(string="Burst Capacity", default=10.0, required=True,
+                            help="Maximum number of requests that can be sent in a burst.")
+    refill_rate = fields.Float(string="Requests per Second", default=2.0, required=True,
+                               help="Sustained request rate allowed for this traffic class.")
+    background_reserve = fields.Float(string="Interactive Reserve", default=0.0,
+                                      help="Tokens background jobs must leave for interactive requests.")
+    max_wait = fields.Float(string="Max Wait (s)", default=10.0,
+                            help="How long a request may wait for a token before giving up.")
+    tokens = fields.Float(string="Available Tokens", readonly=True)
+    last_refill = fields.Float(string="Last Refill (epoch)", readonly=True)
+
+    _sql_constraints = [
+        ('bucket_uniq', 'unique(bucket)', 'There can be only one rate limit per traffic class.'),
+        ('capacity_positive', 'CHECK(capacity >= 1)', 'Burst capacity must be at least 1.'),
+        ('refill_rate_positive', 'CHECK(refill_rate > 0)', 'The request rate must be positive.'),
+    ]
+
+    @api.model
+    def _acquire(self, bucket):
+        """Block until a token is available in ``bucket`` or raise ``MercuryMesRateLimitExceeded``.
+
+        The bucket row is locked and updated in a short transaction of its
+        own, so concurrent workers serialize on it without holding the lock
+        while they sleep or while the MES request is in flight. A worker that
+        waited on the lock hits a serialization failure under Odoo's
+        REPEATABLE READ isolation and simply starts over.
+        """
+        background = self.env.context.get('mercury_mes_priority') == 'background'
+        deadline = None
+        while True:
+            try:
+                with self.env.registry.cursor() as cr:
+                    cr.execute("""
+                        SELECT id, capacity, refill_rate, background_reserve, max_wait, tokens, last_refill,
+                               EXTRACT(EPOCH FROM clock_timestamp())
+                          FROM mercury_mes_rate_limit
+                         WHERE bucket = %s AND active
+                           FOR UPDATE
+                    """, [bucket], log_exceptions=False)
+                    row = cr.fetchone()
+                    if not row:
+                        return True
+                    limit_id, capacity, refill_rate, reserve, max_wait, tokens, last_refill, now = row
+                    now = float(now)
+                    if not last_refill:
+                        tokens = capacity
+                    else:
+                        tokens = min(capacity, (tokens or 0.0) + (now - last_refill) * refill_rate)
+                    floor = min(reserve or 0.0, capacity - 1) if background else 0.0
+                    granted = tokens - 1 >= floor
+                    if granted:
+                        tokens -= 1
+                    cr.execute("UPDATE mercury_mes_rate_limit SET tokens = %s, last_refill = %s WHERE id = %s",
+                               [tokens, now, limit_id], log_exceptions=False)
+            except SerializationFailure:
+                # Another worker updated the bucket while we waited on its lock;
+                # our snapshot is stale, so read it again in a new transaction.
+                continue
+            if granted:
+                return True
+
+            if deadline is None:
+                deadline = time.monotonic() + (max_wait or 0.0)
+            wait = (floor + 1 - tokens) / refill_rate
+            remaining = deadline - time.monotonic()
+            if wait > remaining:
+                _logger.warning(f"Mercury MES rate limit exhausted for '{bucket}' traffic (background={background})")
+                raise MercuryMesRateLimitExceeded(_("Mercury MES API is busy (rate limit reached for %s requests). Please try again shortly.") % bucket)
+            time.sleep(wait)
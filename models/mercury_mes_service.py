@@ -3,6 +3,7 @@
 import requests
 import json
 import logging
+import time
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
@@ -238,6 +239,11 @@ class MercuryMessService(models.AbstractModel):
         _logger.info(f"Mercury MES Get Freight Charge - Request Params: {params}")
         _logger.info(f"Mercury MES Get Freight Charge - Shipment Data Sent: {shipment_data}")
 
+        self.env['mercury.mes.rate.limit']._acquire('rating')
+        journal = self.env['mercury.mes.journal']
+        exchange = {'outcome': 'ambiguous'}
+        response = None
+        started = time.monotonic()
         try:
             response = requests.get(url, params=params, timeout=30)
             response.raise_for_status()
@@ -245,7 +251,9 @@ class MercuryMessService(models.AbstractModel):
             _logger.info(f"Mercury MES Get Freight Charge - Raw Response: {data}")
 
             error_code = data.get('error_code')
+            exchange['error_code'] = error_code if isinstance(error_code, int) else False
             if error_code == 508: # Success
+                exchange['outcome'] = 'success'
                 rate = data.get('rate')
                 if rate is not None:
                     calculated_rate = float(rate)
@@ -256,10 +264,12 @@ class MercuryMessService(models.AbstractModel):
                     return 0.0
             else:
                 error_msg = data.get('error_msg', 'Unknown error')
+                exchange.update(outcome='failed', error_message=error_msg)
                 _logger.error(f"Mercury MES Get Freight Charge failed: {error_msg} (Code: {error_code}) for Order {order.name}")
                 raise UserError(_("Mercury MES Get Freight Charge failed: %s (Code: %s)") % (error_msg, error_code))
 
         except requests.exceptions.RequestException as e:
+            exchange['error_message'] = str(e)
             _logger.error(f"Mercury MES Get Freight Charge Request failed for Order {order.name}: {e}")
             raise UserError(_("Mercury MES Get Freight Charge Request failed: Network error or timeout.")) from e
         except json.JSONDecodeError as e:
@@ -268,6 +278,8 @@ class MercuryMessService(models.AbstractModel):
         except Exception as e:
              _logger.error(f"Mercury MES Get Freight Charge unexpected error for Order {order.name}: {e}")
              raise UserError(_("Mercury MES Get Freight Charge failed: %s") % str(e)) from e
+        finally:
+            journal._record_exchange('getfreight', params, response, started, carrier=carrier, record=order, **exchange)
 
     def book_shipment(self, carrier, picking):
         """Call the Book Collection API."""
@@ -403,6 +415,11 @@ class MercuryMessService(models.AbstractModel):
         _logger.info(f"Mercury MES Book Shipment - Request Data (sensitive fields redacted): {logged_data}")
         _logger.info(f"Mercury MES Book Shipment - Shipment Data Sent: {shipment_data}")
 
+        self.env['mercury.mes.rate.limit']._acquire('booking')
+        journal = self.env['mercury.mes.journal']
+        exchange = {'outcome': 'ambiguous'}
+        response = None
+        started = time.monotonic()
         try:
             # Use POST with form data
             response = requests.post(url, data=data_to_send, timeout=30)
@@ -411,8 +428,10 @@ class MercuryMessService(models.AbstractModel):
             _logger.info(f"Mercury MES Book Shipment - Raw Response: {resp_data}")
 
             error_code = resp_data.get('error_code')
+            exchange['error_code'] = error_code if isinstance(error_code, int) else False
             # KEY FIX 4: Error code 508 actually means SUCCESS (as per your working test)
             if error_code == 508:  # Success
+                exchange['outcome'] = 'success'
                 rate = resp_data.get('rate')
                 waybills = resp_data.get('waybill', [])
                 if waybills:
@@ -429,14 +448,25 @@ class MercuryMessService(models.AbstractModel):
                         raise UserError(_("Mercury MES booking successful but no waybill was returned."))
             elif error_code == 515:  # Duplicate Token
                  error_msg = resp_data.get('error_msg1', resp_data.get('error_msg', 'Duplicate Token'))
+                 exchange.update(outcome='duplicate', error_message=error_msg)
+                 # MES already holds this token: reuse the waybill if an earlier attempt was journaled
+                 booking = journal._get_journaled_booking(token_no)
+                 if booking:
+                     _logger.info(f"Mercury MES Book Shipment - Duplicate Token for Picking {picking.name}, reusing journaled waybill {booking['waybills'][0]}")
+                     return booking
                  _logger.error(f"Mercury MES Book Shipment failed (Duplicate Token) for Picking {picking.name}: {error_msg} (Code: {error_code})")
                  raise UserError(_("Mercury MES booking failed: %s. Please ensure the Picking Name is unique for MES.") % error_msg)
             else:
                 error_msg = resp_data.get('error_msg1', resp_data.get('error_msg', 'Unknown error'))
+                exchange.update(outcome='failed', error_message=error_msg)
                 _logger.error(f"Mercury MES Book Shipment failed for Picking {picking.name}: {error_msg} (Code: {error_code})")
                 raise UserError(_("Mercury MES booking failed: %s (Code: %s)") % (error_msg, error_code))
 
         except requests.exceptions.RequestException as e:
+            # A connect timeout never reached MES; anything later may have been booked.
+            if isinstance(e, requests.exceptions.ConnectTimeout):
+                exchange['outcome'] = 'failed'
+            exchange['error_message'] = str(e)
             _logger.error(f"Mercury MES Book Shipment Request failed for Picking {picking.name}: {e}")
             raise UserError(_("Mercury MES booking request failed: Network error or timeout.")) from e
         except json.JSONDecodeError as e:
@@ -445,11 +475,15 @@ class MercuryMessService(models.AbstractModel):
         except Exception as e:
              _logger.error(f"Mercury MES Book Shipment unexpected error for Picking {picking.name}: {e}")
              raise UserError(_("Mercury MES booking failed: %s") % str(e)) from e
+        finally:
+            journal._record_exchange('bookcollection', data_to_send, response, started, carrier=carrier,
+                                     record=picking, token_no=token_no, **exchange)
 
     # --- Optional methods for tracking, labels, status ---
     def get_tracking_details(self, waybill_number):
         """Get detailed tracking history."""
         url = f"{MES_API_BASE_URL}/getshipmenttrackingdetails/wbid/{waybill_number}"
+        self.env['mercury.mes.rate.limit']._acquire('tracking')
         try:
             response = requests.get(url, timeout=10)
             response.raise_for_status()
@@ -466,6 +500,7 @@ class MercuryMessService(models.AbstractModel):
     def get_current_status(self, waybill_number):
         """Get current shipment status."""
         url = f"{MES_API_BASE_URL}/getshipmenttracking/wbid/{waybill_number}"
+        self.env['mercury.mes.rate.limit']._acquire('tracking')
         try:
             response = requests.get(url, timeout=10)
             response.raise_for_status()
@@ -483,6 +518,7 @@ class MercuryMessService(models.AbstractModel):
     def get_waybill_details(self, waybill_number):
         """Get waybill details including label URL."""
         url = f"{MES_API_BASE_URL}/getwaybilldetail/bid/{waybill_number}"
+        self.env['mercury.mes.rate.limit']._acquire('tracking')
         try:
             response = requests.get(url, timeout=10)
             response.raise_for_status()
@@ -0,0 +1,13 @@
+# delivery_mercury_mes/models/sale_order.py
+
+from odoo import models, fields
+
+
+class SaleOrder(models.Model):
+    _inherit = 'sale.order'
+
+    mercury_mes_quoted_price = fields.Float(
+        string="MES Quoted Price",
+        copy=False,
+        help="Last freight charge returned by Mercury MES for this order."
+    )
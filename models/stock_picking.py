@@ -0,0 +1,59 @@
+# delivery_mercury_mes/models/stock_picking.py
+
+from odoo import models, fields, _, Command
+from odoo.exceptions import UserError
+
+
+class StockPicking(models.Model):
+    _inherit = 'stock.picking'
+
+    mercury_mes_quoted_price = fields.Float(
+        string="MES Quoted Price",
+        copy=False,
+        help="Freight charge quoted by Mercury MES when the sale order was rated."
+    )
+    mercury_mes_quote_partial = fields.Boolean(
+        string="Partial Delivery (Whole-Order Quote)",
+        copy=False,
+        help="The quote was made for the whole sale order while this picking only ships part of it "
+             "(backorder or split delivery), so it cannot be compared with this booking."
+    )
+    mercury_mes_booked_price = fields.Float(
+        string="MES Booked Price",
+        copy=False,
+        help="Rate returned by Mercury MES when the shipment was booked, before carrier margin or free shipping."
+    )
+    mercury_mes_invoiced_price = fields.Float(
+        string="MES Invoiced Price",
+        copy=False,
+        help="Amount Mercury MES invoiced for this shipment."
+    )
+
+    def _mercury_mes_record_booking(self, rate):
+        """Store the raw MES booking rate and the sale order quote it reconciles against."""
+        for picking in self:
+            order = picking.sale_id
+            deliveries = order.picking_ids.filtered(
+                lambda p: p.picking_type_code == 'outgoing' and p.state != 'cancel')
+            picking.write({
+                'mercury_mes_booked_price': float(rate),
+                'mercury_mes_quoted_price': order.mercury_mes_quoted_price,
+                'mercury_mes_quote_partial': bool(picking.backorder_id) or len(deliveries) > 1,
+            })
+
+    def action_mercury_mes_batch_book(self):
+        """Book the selected pickings with Mercury MES in a resumable batch."""
+        if not self:
+            raise UserError(_("No picking selected."))
+        batch = self.env['mercury.mes.batch.booking'].create({
+            'line_ids': [Command.create({'picking_id': picking.id}) for picking in self],
+        })
+        batch.action_start()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _("Mercury MES Batch Booking"),
+            'res_model': 'mercury.mes.batch.booking',
+            'res_id': batch.id,
+            'view_mode': 'form',
+            'target': 'current',
+        }
@@ -0,0 +1,4 @@
+from . import test_mercury_mes_batch_booking
+from . import test_mercury_mes_journal
+from . import test_mercury_mes_rate_limit
+from . import test_mercury_mes_reconciliation
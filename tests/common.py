@@ -0,0 +1,55 @@
+# delivery_mercury_mes/tests/common.py
+
+import base64
+import json
+import zlib
+
+from odoo.tests.common import TransactionCase
+
+
+class MercuryMesCommon(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Journal entries and rate-limit buckets use their own cursors;
+        # test mode routes them through the test transaction.
+        cls.registry.enter_test_mode(cls.cr)
+        cls.addClassCleanup(cls.registry.leave_test_mode)
+
+        zambia = cls.env.ref('base.zm')
+        cls.env.company.partner_id.write({'country_id': zambia.id, 'city': 'Lusaka'})
+        delivery_product = cls.env['product.product'].create({'name': 'Mercury MES Delivery', 'type': 'service'})
+        cls.carrier = cls.env['delivery.carrier'].create({
+            'name': 'Mercury MES',
+            'delivery_type': 'mercury_mes',
+            'product_id': delivery_product.id,
+            'mercury_mes_email': 'ops@example.com',
+            'mercury_mes_private_key': 'secret-key',
+        })
+        cls.partner = cls.env['res.partner'].create({
+            'name': 'Jane Banda',
+            'country_id': zambia.id,
+            'city': 'Ndola',
+        })
+        cls.picking = cls.env['stock.picking'].create({
+            'partner_id': cls.partner.id,
+            'picking_type_id': cls.env.ref('stock.picking_type_out').id,
+            'location_id': cls.env.ref('stock.stock_location_stock').id,
+            'location_dest_id': cls.env.ref('stock.stock_location_customers').id,
+            'carrier_id': cls.carrier.id,
+        })
+
+    def _journal(self, outcome, response=None, picking=None, **vals):
+        picking = picking or self.picking
+        return self.env['mercury.mes.journal'].create(dict({
+            'endpoint': 'bookcollection',
+            'token_no': picking.name,
+            'reference': picking.name,
+            'res_model': 'stock.picking',
+            'res_id': picking.id,
+            'carrier_id': self.carrier.id,
+            'outcome': outcome,
+            'retry_state': 'none' if outcome == 'success' else 'pending',
+            'response_payload': base64.b64encode(zlib.compress(json.dumps(response).encode())) if response else False,
+        }, **vals))
@@ -0,0 +1,117 @@
+# delivery_mercury_mes/tests/test_mercury_mes_batch_booking.py
+
+from unittest.mock import patch
+
+from odoo import Command
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.delivery_mercury_mes.models.mercury_mes_rate_limit import MercuryMesRateLimitExceeded
+
+from .common import MercuryMesCommon
+
+
+def _book(picking):
+    picking.carrier_tracking_ref = f"WB-{picking.name}"
+
+
+@tagged('post_install', '-at_install')
+class TestMercuryMesBatchBooking(MercuryMesCommon):
+
+    def _ready_picking(self, **vals):
+        picking = self.picking.copy(dict({'carrier_id': self.carrier.id}, **vals))
+        picking.state = 'assigned'
+        return picking
+
+    def _batch(self, pickings, **vals):
+        return self.env['mercury.mes.batch.booking'].create(dict({
+            'state': 'running',
+            'line_ids': [Command.create({'picking_id': picking.id}) for picking in pickings],
+        }, **vals))
+
+    def _patch_send_to_shipper(self, side_effect=_book):
+        return patch.object(type(self.env['stock.picking']), 'send_to_shipper', autospec=True, side_effect=side_effect)
+
+    def _line(self, batch, picking):
+        return batch.line_ids.filtered(lambda l: l.picking_id == picking)
+
+    def test_skip_reasons(self):
+        booked = self._ready_picking(carrier_tracking_ref='WB-OLD')
+        cancelled = self._ready_picking()
+        cancelled.state = 'cancel'
+        draft = self._ready_picking()
+        draft.state = 'draft'
+        receipt = self._ready_picking(
+            picking_type_id=self.env.ref('stock.picking_type_in').id,
+            location_id=self.env.ref('stock.stock_location_suppliers').id,
+            location_dest_id=self.env.ref('stock.stock_location_stock').id,
+        )
+        own_fleet = self._ready_picking(carrier_id=self.carrier.copy({'delivery_type': 'fixed'}).id)
+        batch = self._batch(booked | cancelled | draft | receipt | own_fleet)
+        with self._patch_send_to_shipper() as send_to_shipper:
+            batch._process()
+        send_to_shipper.assert_not_called()
+        self.assertEqual(set(batch.line_ids.mapped('state')), {'skipped'})
+        self.assertEqual(self._line(batch, booked).carrier_tracking_ref, 'WB-OLD')
+        self.assertEqual(self._line(batch, receipt).message, "Not an outgoing delivery.")
+        self.assertEqual(self._line(batch, own_fleet).message, "Delivery method is not Mercury MES.")
+        self.assertEqual(batch.state, 'done')
+
+    def test_failure_only_fails_its_own_line(self):
+        bad, good = self._ready_picking(), self._ready_picking()
+
+        def book(picking):
+            if picking == bad:
+                raise UserError("Mercury MES booking failed: Invalid city (Code: 501)")
+            _book(picking)
+
+        batch = self._batch(bad | good)
+        with self._patch_send_to_shipper(book):
+            batch._process()
+        self.assertEqual(self._line(batch, bad).state, 'failed')
+        self.assertIn("Invalid city", self._line(batch, bad).message)
+        self.assertEqual(self._line(batch, good).state, 'booked')
+        self.assertEqual(self._line(batch, good).carrier_tracking_ref, f"WB-{good.name}")
+        self.assertEqual((batch.count_booked, batch.count_failed), (1, 1))
+
+    def test_busy_rate_limiter_leaves_line_pending(self):
+        first, second = self._ready_picking(), self._ready_picking()
+        batch = self._batch(first | second)
+        with self._patch_send_to_shipper(MercuryMesRateLimitExceeded("Mercury MES API is busy")) as send_to_shipper, \
+                patch.object(type(self.env['ir.cron']), '_trigger', autospec=True):
+            batch._process()
+        send_to_shipper.assert_called_once()
+        self.assertEqual(set(batch.line_ids.mapped('state')), {'pending'})
+        self.assertEqual(batch.state, 'running')
+
+    def test_reset_failed_requeues_lines(self):
+        picking = self._ready_picking()
+        batch = self._batch(picking, state='done')
+        batch.line_ids.write({'state': 'failed', 'message': "Invalid city"})
+        batch.action_reset_failed()
+        self.assertEqual(batch.line_ids.state, 'pending')
+        self.assertFalse(batch.line_ids.message)
+        self.assertEqual(batch.state, 'running')
+        with self.assertRaises(UserError):
+            batch.action_reset_failed()
+
+    def test_resume_skips_processed_lines(self):
+        done, pending = self._ready_picking(), self._ready_picking()
+        batch = self._batch(done | pending)
+        self._line(batch, done).write({'state': 'booked', 'carrier_tracking_ref': 'WB-EARLIER'})
+        with self._patch_send_to_shipper() as send_to_shipper:
+            self.env['mercury.mes.batch.booking']._cron_process_batches()
+        send_to_shipper.assert_called_once()
+        self.assertEqual(self._line(batch, done).carrier_tracking_ref, 'WB-EARLIER')
+        self.assertEqual(self._line(batch, pending).state, 'booked')
+        self.assertEqual(batch.state, 'done')
+
+    def test_action_resume_queues_the_cron(self):
+        batch = self._batch(self._ready_picking(), state='draft')
+        with self._patch_send_to_shipper() as send_to_shipper, \
+                patch.object(type(self.env['ir.cron']), '_trigger', autospec=True) as trigger:
+            batch.action_resume()
+        trigger.assert_called_once()
+        send_to_shipper.assert_not_called()
+        self.assertEqual(batch.state, 'running')
+        self.assertEqual(batch.line_ids.state, 'pending')
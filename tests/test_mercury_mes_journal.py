@@ -0,0 +1,135 @@
+# delivery_mercury_mes/tests/test_mercury_mes_journal.py
+
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from odoo.exceptions import UserError
+from odoo.tests import tagged
+
+from odoo.addons.delivery_mercury_mes.models.mercury_mes_rate_limit import MercuryMesRateLimitExceeded
+
+from .common import MercuryMesCommon
+
+SERVICE_REQUESTS = 'odoo.addons.delivery_mercury_mes.models.mercury_mes_service.requests'
+BOOKED = {'error_code': 508, 'rate': '150', 'waybill': ['WB0001']}
+
+
+def _response(payload):
+    response = MagicMock()
+    response.json.return_value = payload
+    response.text = json.dumps(payload)
+    return response
+
+
+@tagged('post_install', '-at_install')
+class TestMercuryMesJournal(MercuryMesCommon):
+
+    def _retry(self):
+        self.env['mercury.mes.journal']._retry_failed_bookings()
+
+    def _patch_send_to_shipper(self):
+        return patch.object(type(self.env['stock.picking']), 'send_to_shipper', autospec=True)
+
+    def test_record_exchange_redacts_and_queues_duplicate(self):
+        self.env['mercury.mes.journal']._record_exchange(
+            'bookcollection', {'private_key': 'secret-key', 'token_no': self.picking.name}, None,
+            time.monotonic(), 'duplicate', carrier=self.carrier, record=self.picking, token_no=self.picking.name)
+        entry = self.env['mercury.mes.journal'].search([('token_no', '=', self.picking.name)])
+        self.assertEqual(entry.retry_state, 'pending')
+        self.assertNotIn('secret-key', entry.request_payload)
+
+    def test_duplicate_recovers_journaled_waybill(self):
+        self.carrier.margin = 10
+        self._journal('success', BOOKED)
+        duplicate = self._journal('duplicate')
+        self.picking.state = 'assigned'
+        with patch(SERVICE_REQUESTS + '.post', return_value=_response({'error_code': 515, 'error_msg': 'Duplicate Token'})):
+            self._retry()
+        self.assertEqual(self.picking.carrier_tracking_ref, 'WB0001')
+        self.assertEqual(self.picking.mercury_mes_booked_price, 150.0)
+        # Recovery goes through send_to_shipper, so the carrier margin applies as for any booking
+        self.assertAlmostEqual(self.picking.carrier_price, 165.0)
+        self.assertEqual(duplicate.retry_state, 'resolved')
+
+    def test_duplicate_without_success_needs_manual_check(self):
+        duplicate = self._journal('duplicate')
+        self.picking.state = 'assigned'
+        with self._patch_send_to_shipper() as send_to_shipper:
+            self._retry()
+        send_to_shipper.assert_not_called()
+        self.assertEqual(duplicate.retry_state, 'manual')
+
+    def test_gives_up_after_max_attempts(self):
+        entries = self._journal('failed') | self._journal('ambiguous') | self._journal('failed')
+        self.picking.state = 'done'
+        with self._patch_send_to_shipper() as send_to_shipper:
+            self._retry()
+        send_to_shipper.assert_not_called()
+        self.assertEqual(set(entries.mapped('retry_state')), {'manual'})
+
+    def test_cancelled_picking_is_abandoned(self):
+        entry = self._journal('ambiguous')
+        self.picking.state = 'cancel'
+        self._retry()
+        self.assertEqual(entry.retry_state, 'abandoned')
+
+    def test_changed_carrier_is_abandoned(self):
+        entry = self._journal('failed')
+        self.picking.carrier_id = self.carrier.copy({'name': 'Own Fleet', 'delivery_type': 'fixed'})
+        self.picking.state = 'done'
+        self._retry()
+        self.assertEqual(entry.retry_state, 'abandoned')
+
+    def test_draft_picking_stays_pending(self):
+        entry = self._journal('ambiguous')
+        with self._patch_send_to_shipper() as send_to_shipper:
+            self._retry()
+        send_to_shipper.assert_not_called()
+        self.assertEqual(entry.retry_state, 'pending')
+
+    def test_real_failure_is_resent_without_validation(self):
+        # A failed booking rolls back the validation, so the picking is only ready
+        entry = self._journal('ambiguous')
+        self.picking.state = 'assigned'
+        with self._patch_send_to_shipper() as send_to_shipper:
+            self._retry()
+        send_to_shipper.assert_called_once()
+        self.assertEqual(entry.retry_state, 'resolved')
+
+    def test_failed_resend_is_marked_retried(self):
+        entry = self._journal('failed')
+        self.picking.state = 'assigned'
+        with self._patch_send_to_shipper() as send_to_shipper:
+            send_to_shipper.side_effect = UserError("Mercury MES booking failed: Invalid city (Code: 501)")
+            self._retry()
+        self.assertEqual(entry.retry_state, 'retried')
+
+    def test_busy_rate_limiter_keeps_booking_pending(self):
+        entry = self._journal('failed')
+        self.picking.state = 'assigned'
+        with self._patch_send_to_shipper() as send_to_shipper:
+            send_to_shipper.side_effect = MercuryMesRateLimitExceeded("Mercury MES API is busy")
+            self._retry()
+        self.assertEqual(entry.retry_state, 'pending')
+
+    def test_book_shipment_duplicate_reuses_journaled_waybill(self):
+        self._journal('success', BOOKED)
+        with patch(SERVICE_REQUESTS + '.post', return_value=_response({'error_code': 515, 'error_msg': 'Duplicate Token'})):
+            result = self.env['mercury.mes.service'].book_shipment(self.carrier, self.picking)
+        self.assertEqual(result, {'rate': 150.0, 'waybills': ['WB0001']})
+
+    def test_book_shipment_duplicate_without_journal_raises(self):
+        with patch(SERVICE_REQUESTS + '.post', return_value=_response({'error_code': 515, 'error_msg': 'Duplicate Token'})):
+            with self.assertRaises(UserError):
+                self.env['mercury.mes.service'].book_shipment(self.carrier, self.picking)
+
+    def test_book_shipment_timeout_is_journaled_as_ambiguous(self):
+        with patch(SERVICE_REQUESTS + '.post', side_effect=requests.exceptions.ReadTimeout()):
+            with self.assertRaises(UserError):
+                self.env['mercury.mes.service'].book_shipment(self.carrier, self.picking)
+        entry = self.env['mercury.mes.journal'].search([('token_no', '=', self.picking.name)])
+        self.assertEqual(entry.outcome, 'ambiguous')
+        self.assertEqual(entry.retry_state, 'pending')
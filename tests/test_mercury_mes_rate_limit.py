@@ -0,0 +1,118 @@
+# delivery_mercury_mes/tests/test_mercury_mes_rate_limit.py
+
+import threading
+from unittest.mock import patch
+
+from odoo import sql_db
+from odoo.exceptions import UserError
+from odoo.modules.registry import Registry
+from odoo.tests import tagged
+
+from .common import MercuryMesCommon
+
+RATE_LIMIT_SLEEP = 'odoo.addons.delivery_mercury_mes.models.mercury_mes_rate_limit.time.sleep'
+
+
+@tagged('post_install', '-at_install')
+class TestMercuryMesRateLimit(MercuryMesCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.bucket = cls.env.ref('delivery_mercury_mes.rate_limit_booking')
+        cls.RateLimit = cls.env['mercury.mes.rate.limit']
+
+    def _db_now(self):
+        self.env.cr.execute("SELECT EXTRACT(EPOCH FROM clock_timestamp())")
+        return float(self.env.cr.fetchone()[0])
+
+    def _set_bucket(self, **vals):
+        vals.setdefault('capacity', 10)
+        vals.setdefault('background_reserve', 4)
+        self.bucket.write(vals)
+        self.bucket.flush_recordset()
+
+    def _tokens(self):
+        self.bucket.invalidate_recordset(['tokens'])
+        return self.bucket.tokens
+
+    def test_first_use_starts_full(self):
+        self._set_bucket(tokens=0, last_refill=0)
+        self.RateLimit._acquire('booking')
+        self.assertAlmostEqual(self._tokens(), 9)
+
+    def test_refill_since_last_use(self):
+        self._set_bucket(tokens=0, refill_rate=2, last_refill=self._db_now() - 2)
+        self.RateLimit._acquire('booking')
+        self.assertAlmostEqual(self._tokens(), 3, delta=0.2)
+
+    def test_refill_capped_at_capacity(self):
+        self._set_bucket(tokens=0, refill_rate=2, last_refill=self._db_now() - 1000)
+        self.RateLimit._acquire('booking')
+        self.assertAlmostEqual(self._tokens(), 9, delta=0.01)
+
+    def test_background_leaves_interactive_reserve(self):
+        self._set_bucket(tokens=4.5, refill_rate=0.001, max_wait=0, last_refill=self._db_now())
+        with self.assertRaises(UserError):
+            self.RateLimit.with_context(mercury_mes_priority='background')._acquire('booking')
+        self.RateLimit._acquire('booking')
+        self.assertAlmostEqual(self._tokens(), 3.5, delta=0.01)
+
+    def test_waits_for_refill(self):
+        self._set_bucket(tokens=0.5, refill_rate=10, max_wait=5, last_refill=self._db_now())
+
+        def refill(seconds):
+            self.env.cr.execute("UPDATE mercury_mes_rate_limit SET tokens = capacity WHERE id = %s", [self.bucket.id])
+
+        with patch(RATE_LIMIT_SLEEP, side_effect=refill) as sleep:
+            self.RateLimit._acquire('booking')
+        sleep.assert_called_once()
+        self.assertAlmostEqual(sleep.call_args[0][0], 0.05, delta=0.01)
+
+    def test_gives_up_beyond_max_wait(self):
+        self._set_bucket(tokens=0, refill_rate=0.001, max_wait=1, last_refill=self._db_now())
+        with patch(RATE_LIMIT_SLEEP) as sleep, self.assertRaises(UserError):
+            self.RateLimit._acquire('booking')
+        sleep.assert_not_called()
+
+    def test_inactive_bucket_is_unlimited(self):
+        self._set_bucket(tokens=0, refill_rate=0.001, max_wait=0, last_refill=self._db_now(), active=False)
+        self.assertTrue(self.RateLimit._acquire('booking'))
+        self.assertEqual(self._tokens(), 0)
+
+    def test_concurrent_workers_share_bucket(self):
+        # Real cursors: the test cursor cannot show two transactions racing on the row.
+        db = sql_db.db_connect(self.env.cr.dbname)
+        with db.cursor() as cr:
+            cr.execute("SELECT tokens, last_refill FROM mercury_mes_rate_limit WHERE bucket = 'tracking'")
+            saved = cr.fetchone()
+        self.addCleanup(self._restore_bucket, db, 'tracking', saved)
+
+        errors = []
+
+        def waiter():
+            try:
+                with patch.object(Registry, 'cursor', lambda registry: db.cursor()):
+                    self.RateLimit._acquire('tracking')
+            except Exception as e:
+                errors.append(e)
+
+        holder = db.cursor()
+        try:
+            # The holder updates the row and keeps it locked until it commits,
+            # so the waiter's snapshot is stale once it gets the lock.
+            holder.execute("UPDATE mercury_mes_rate_limit SET tokens = capacity, last_refill = 0 WHERE bucket = 'tracking'")
+            thread = threading.Thread(target=waiter)
+            thread.start()
+            thread.join(0.5)
+            holder.commit()
+        finally:
+            holder.close()
+        thread.join(10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(errors, [])
+
+    def _restore_bucket(self, db, bucket, saved):
+        with db.cursor() as cr:
+            cr.execute("UPDATE mercury_mes_rate_limit SET tokens = %s, last_refill = %s WHERE bucket = %s",
+                       [saved[0], saved[1], bucket])
@@ -0,0 +1,126 @@
+# delivery_mercury_mes/tests/test_mercury_mes_reconciliation.py
+
+import base64
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.delivery_mercury_mes.wizards.mercury_mes_reconciliation_wizard import EXPORT_HEADER
+
+from .common import MercuryMesCommon
+
+WIZARD_MODULE = 'odoo.addons.delivery_mercury_mes.wizards.mercury_mes_reconciliation_wizard'
+
+
+@tagged('post_install', '-at_install')
+class TestMercuryMesReconciliation(MercuryMesCommon):
+
+    def setUp(self):
+        super().setUp()
+        self.wizard = self.env['mercury.mes.reconciliation.wizard'].create({'threshold_percent': 5.0})
+        self.export = self.env['mercury.mes.reconciliation.wizard'].with_context(tz='Africa/Lusaka').create({
+            'date_from': date(2026, 3, 1),
+            'date_to': date(2026, 3, 10),
+            'threshold_percent': 5.0,
+        })
+
+    def _shipped(self, date_done, quoted=100.0, booked=100.0, invoiced=0.0):
+        picking = self.picking.copy({
+            'carrier_tracking_ref': f"WB-{len(self.env['stock.picking'].search([]))}",
+            'date_done': date_done,
+            'mercury_mes_quoted_price': quoted,
+            'mercury_mes_booked_price': booked,
+            'mercury_mes_invoiced_price': invoiced,
+        })
+        picking.state = 'done'
+        return picking
+
+    def _exported_names(self, wizard=None):
+        return [row[0] for row in (wizard or self.export)._iter_rows()]
+
+    def test_matching_prices_are_ok(self):
+        self.assertEqual(self.wizard._get_status(100.0, 102.0, 101.0, False), 'ok')
+
+    def test_missing_quote_is_not_a_variance(self):
+        self.assertEqual(self.wizard._get_status(0.0, 100.0, 0.0, False), 'no_quote')
+
+    def test_partial_delivery_ignores_whole_order_quote(self):
+        self.assertEqual(self.wizard._get_status(300.0, 100.0, 100.0, True), 'partial')
+        self.assertEqual(self.wizard._get_status(300.0, 100.0, 150.0, True), 'variance')
+
+    def test_invoice_compared_with_quote(self):
+        self.assertEqual(self.wizard._get_status(100.0, 0.0, 120.0, False), 'variance')
+
+    def test_invoice_import_matches_waybills(self):
+        self.picking.carrier_tracking_ref = 'WB0001'
+        wizard = self.env['mercury.mes.invoice.import.wizard'].create({
+            'file': base64.b64encode(b"waybill,amount\nWB0001,175.50\nWB9999,10\n"),
+        })
+        action = wizard.action_import()
+        self.assertEqual(self.picking.mercury_mes_invoiced_price, 175.5)
+        self.assertIn('WB9999', action['params']['message'])
+
+    def test_invoice_import_sums_repeated_waybills(self):
+        self.picking.carrier_tracking_ref = 'WB0001'
+        wizard = self.env['mercury.mes.invoice.import.wizard'].create({
+            'file': base64.b64encode(b"waybill,amount\nWB0001,100\nWB0002,5\nWB0001,20.50\n"),
+        })
+        with patch('odoo.addons.delivery_mercury_mes.wizards.mercury_mes_invoice_import_wizard.IMPORT_BATCH_SIZE', 2):
+            action = wizard.action_import()
+            self.assertEqual(self.picking.mercury_mes_invoiced_price, 120.5)
+            # Importing the same file again replaces the amounts instead of adding to them.
+            wizard.action_import()
+        self.assertEqual(self.picking.mercury_mes_invoiced_price, 120.5)
+        self.assertIn("1 shipment(s) updated", action['params']['message'])
+
+    def test_export_pages_through_all_pickings(self):
+        pickings = self.env['stock.picking']
+        for day in range(1, 6):
+            pickings |= self._shipped(datetime(2026, 3, day, 10, 0))
+        with patch(WIZARD_MODULE + '.PAGE_SIZE', 2):
+            self.assertEqual(self._exported_names(), pickings.mapped('name'))
+
+    def test_export_date_bounds_follow_user_timezone(self):
+        # Lusaka is UTC+2.
+        before = self._shipped(datetime(2026, 2, 28, 21, 30))
+        first_morning = self._shipped(datetime(2026, 2, 28, 23, 0))
+        last_evening = self._shipped(datetime(2026, 3, 10, 21, 59, 59))
+        after = self._shipped(datetime(2026, 3, 10, 22, 0))
+        names = self._exported_names()
+        self.assertEqual(names, (first_morning | last_evening).mapped('name'))
+        self.assertNotIn(before.name, names)
+        self.assertNotIn(after.name, names)
+
+    def test_export_is_limited_to_selected_companies(self):
+        self._shipped(datetime(2026, 3, 5, 10, 0))
+        other_company = self.env['res.company'].create({'name': 'Mercury MES Other Co'})
+        self.assertTrue(self._exported_names())
+        self.assertFalse(self._exported_names(self.export.with_context(allowed_company_ids=[other_company.id])))
+
+    def test_export_only_flagged(self):
+        self._shipped(datetime(2026, 3, 5, 10, 0))
+        variance = self._shipped(datetime(2026, 3, 5, 11, 0), booked=150.0)
+        self.export.only_flagged = True
+        self.assertEqual(self._exported_names(), [variance.name])
+
+    def test_export_csv(self):
+        picking = self._shipped(datetime(2026, 3, 5, 10, 0), booked=150.0, invoiced=160.0)
+        content = b''.join(self.export._stream_csv()).decode('utf-8-sig')
+        header, row = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(header, EXPORT_HEADER)
+        self.assertEqual(row[0], picking.name)
+        self.assertEqual(row[3], picking.carrier_tracking_ref)
+        self.assertEqual(row[8:], ['50.0', '10.0', '60.0', 'Variance'])
+
+    def test_export_xlsx(self):
+        picking = self._shipped(datetime(2026, 3, 5, 10, 0))
+        content = b''.join(self.export._stream_xlsx())
+        self.assertTrue(content.startswith(b'PK'))
+        with zipfile.ZipFile(io.BytesIO(content)) as workbook:
+            sheet = workbook.read('xl/worksheets/sheet1.xml').decode()
+        self.assertIn(picking.name, sheet)
+        self.assertIn(picking.carrier_tracking_ref, sheet)
@@ -0,0 +1,2 @@
+from . import mercury_mes_invoice_import_wizard
+from . import mercury_mes_reconciliation_wizard
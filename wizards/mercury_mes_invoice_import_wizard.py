@@ -0,0 +1,101 @@
+# delivery_mercury_mes/wizards/mercury_mes_invoice_import_wizard.py
+
+import base64
+import csv
+import io
+from collections import defaultdict
+
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+from odoo.tools import split_every
+
+IMPORT_BATCH_SIZE = 1000
+UNMATCHED_SHOWN = 20
+
+
+class MercuryMesInvoiceImportWizard(models.TransientModel):
+    _name = 'mercury.mes.invoice.import.wizard'
+    _description = 'Import Mercury MES Invoiced Amounts'
+
+    file = fields.Binary(string="CSV File", required=True)
+    filename = fields.Char(string="File Name")
+    waybill_column = fields.Char(string="Waybill Column", default='waybill', required=True)
+    amount_column = fields.Char(string="Amount Column", default='amount', required=True)
+    delimiter = fields.Selection([
+        (',', 'Comma'),
+        (';', 'Semicolon'),
+        ('\t', 'Tab'),
+    ], string="Delimiter", default=',', required=True)
+
+    def _iter_amounts(self):
+        """Yield ``(waybill, amount)`` pairs from the uploaded MES invoice CSV."""
+        self.ensure_one()
+        stream = io.TextIOWrapper(io.BytesIO(base64.b64decode(self.file)), encoding='utf-8-sig')
+        reader = csv.DictReader(stream, delimiter=self.delimiter)
+        missing = {self.waybill_column, self.amount_column} - set(reader.fieldnames or [])
+        if missing:
+            raise UserError(_("Column(s) %s not found in the file.") % ", ".join(sorted(missing)))
+        for row in reader:
+            waybill = (row[self.waybill_column] or '').strip()
+            if not waybill:
+                continue
+            try:
+                amount = float((row[self.amount_column] or '').strip())
+            except ValueError:
+                raise UserError(_("Invalid amount '%s' for waybill %s on line %s.")
+                                % (row[self.amount_column], waybill, reader.line_num))
+            yield waybill, amount
+
+    def action_import(self):
+        """Set the MES invoiced price on pickings matched by waybill, in batches.
+
+        A waybill listed on several lines (e.g. freight plus surcharges) is
+        invoiced the sum of its amounts, even when its lines fall in
+        different batches. Importing the same file again replaces the
+        amounts rather than adding to them.
+        """
+        self.ensure_one()
+        Picking = self.env['stock.picking']
+        updated = unmatched_count = 0
+        unmatched = []
+        seen = set()
+        for batch in split_every(IMPORT_BATCH_SIZE, self._iter_amounts()):
+            amounts = defaultdict(float)
+            for waybill, amount in batch:
+                amounts[waybill] += amount
+            pickings = Picking.search([
+                ('carrier_tracking_ref', 'in', list(amounts)),
+                ('carrier_id.delivery_type', '=', 'mercury_mes'),
+            ])
+            by_amount = defaultdict(lambda: Picking)
+            for picking in pickings:
+                waybill = picking.carrier_tracking_ref
+                if waybill in seen:
+                    # Earlier lines of this file were already written: add to them.
+                    by_amount[picking.mercury_mes_invoiced_price + amounts[waybill]] |= picking
+                else:
+                    by_amount[amounts[waybill]] |= picking
+                    updated += 1
+            for amount, matched in by_amount.items():
+                matched.write({'mercury_mes_invoiced_price': amount})
+            missing = sorted(set(amounts) - set(pickings.mapped('carrier_tracking_ref')) - seen)
+            unmatched_count += len(missing)
+            unmatched += missing[:UNMATCHED_SHOWN - len(unmatched)]
+            seen.update(amounts)
+            Picking.invalidate_model()
+
+        message = _("%s shipment(s) updated.") % updated
+        if unmatched_count:
+            message += " " + _("%s waybill(s) not found: %s") % (
+                unmatched_count, ", ".join(unmatched) + ("…" if unmatched_count > len(unmatched) else ""))
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Mercury MES Invoice Import"),
+                'message': message,
+                'type': 'warning' if unmatched_count else 'success',
+                'sticky': bool(unmatched_count),
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
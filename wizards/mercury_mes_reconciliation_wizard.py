@@ -0,0 +1,205 @@
+# delivery_mercury_mes/wizards/mercury_mes_reconciliation_wizard.py
+
+import csv
+import io
+import tempfile
+from datetime import datetime, time, timedelta
+
+import pytz
+import xlsxwriter
+
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+
+PAGE_SIZE = 2000
+STREAM_CHUNK_SIZE = 64 * 1024
+
+EXPORT_HEADER = [
+    'Picking', 'Date Done', 'Delivery Method', 'Waybill', 'Sale Order',
+    'Quoted Price', 'MES Booked Price', 'Invoiced Price',
+    'Booked - Quoted', 'Invoiced - Booked', 'Invoiced - Quoted', 'Status',
+]
+AMOUNT_COLUMNS = range(5, 11)
+
+STATUS_LABELS = {
+    'ok': 'OK',
+    'variance': 'Variance',
+    'no_quote': 'No quote',
+    'partial': 'Partial delivery',
+}
+
+
+class MercuryMesReconciliationWizard(models.TransientModel):
+    _name = 'mercury.mes.reconciliation.wizard'
+    _description = 'Mercury MES Freight Cost Reconciliation'
+
+    date_from = fields.Date(string="From", required=True,
+                            default=lambda self: fields.Date.today().replace(day=1))
+    date_to = fields.Date(string="To", required=True, default=fields.Date.today)
+    threshold_percent = fields.Float(string="Variance Threshold (%)", default=5.0,
+                                     help="Flag shipments whose price moved by more than this percentage.")
+    threshold_amount = fields.Float(string="Variance Threshold (Amount)", default=0.0,
+                                    help="Flag shipments whose price moved by more than this amount. 0 disables it.")
+    only_flagged = fields.Boolean(string="Only Variances")
+    file_format = fields.Selection([
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel (XLSX)'),
+    ], string="Format", default='csv', required=True)
+
+    @api.constrains('date_from', 'date_to')
+    def _check_dates(self):
+        for wizard in self:
+            if wizard.date_from > wizard.date_to:
+                raise ValidationError(_("The start date must be before the end date."))
+
+    def action_export(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/mercury_mes/reconciliation/export/{self.id}',
+            'target': 'self',
+        }
+
+    def _get_filename(self):
+        return f"mercury_mes_reconciliation_{self.date_from}_{self.date_to}.{self.file_format}"
+
+    # --- Row generation ---
+
+    def _get_utc_bounds(self):
+        """Return the ``[start, end)`` UTC range covering the selected days in the user's timezone."""
+        tz = pytz.timezone(self.env.context.get('tz') or self.env.user.tz or 'UTC')
+        start = tz.localize(datetime.combine(self.date_from, time.min))
+        end = tz.localize(datetime.combine(self.date_to + timedelta(days=1), time.min))
+        return (start.astimezone(pytz.utc).replace(tzinfo=None),
+                end.astimezone(pytz.utc).replace(tzinfo=None))
+
+    def _is_flagged(self, reference, actual):
+        """Whether ``actual`` drifts from a known ``reference`` beyond the thresholds."""
+        if not reference:
+            return False
+        variance = abs(actual - reference)
+        if self.threshold_amount and variance > self.threshold_amount:
+            return True
+        if self.threshold_percent:
+            return variance / abs(reference) * 100.0 > self.threshold_percent
+        return False
+
+    def _get_status(self, quoted, booked, invoiced, quote_partial):
+        """Classify a shipment as ``ok``, ``variance``, ``no_quote`` or ``partial``.
+
+        Prices that are missing are not compared at all, and a whole-order
+        quote is not held against a partial delivery.
+        """
+        comparisons = []
+        if booked and invoiced:
+            comparisons.append((booked, invoiced))
+        if quoted and not quote_partial:
+            if booked:
+                comparisons.append((quoted, booked))
+            if invoiced:
+                comparisons.append((quoted, invoiced))
+        if any(self._is_flagged(reference, actual) for reference, actual in comparisons):
+            return 'variance'
+        if quote_partial:
+            return 'partial'
+        if not quoted:
+            return 'no_quote'
+        return 'ok'
+
+    def _iter_rows(self):
+        """Yield one reconciliation row per booked Mercury MES picking.
+
+        Pickings are read with keyset pagination in pages of ``PAGE_SIZE``
+        and only plain tuples are kept, so memory stays flat whatever the
+        date range.
+        """
+        self.ensure_one()
+        self.env['stock.picking'].flush_model([
+            'name', 'date_done', 'carrier_id', 'carrier_tracking_ref', 'sale_id', 'company_id',
+            'mercury_mes_booked_price', 'mercury_mes_quoted_price', 'mercury_mes_quote_partial',
+            'mercury_mes_invoiced_price',
+        ])
+        carriers = self.env['delivery.carrier'].with_context(active_test=False).search(
+            [('delivery_type', '=', 'mercury_mes')])
+        if not carriers:
+            return
+        carrier_names = {carrier.id: carrier.name for carrier in carriers}
+        date_start, date_end = self._get_utc_bounds()
+        last_id = 0
+        while True:
+            self.env.cr.execute("""
+                SELECT p.id, p.name, p.date_done, p.carrier_id, p.carrier_tracking_ref, so.name,
+                       COALESCE(p.mercury_mes_quoted_price, 0), COALESCE(p.mercury_mes_booked_price, 0),
+                       COALESCE(p.mercury_mes_invoiced_price, 0), COALESCE(p.mercury_mes_quote_partial, FALSE)
+                  FROM stock_picking p
+             LEFT JOIN sale_order so ON so.id = p.sale_id
+                 WHERE p.id > %s
+                   AND p.carrier_id IN %s
+                   AND p.company_id IN %s
+                   AND p.carrier_tracking_ref IS NOT NULL
+                   AND p.date_done >= %s AND p.date_done < %s
+              ORDER BY p.id
+                 LIMIT %s
+            """, [last_id, tuple(carriers.ids), tuple(self.env.companies.ids),
+                  date_start, date_end, PAGE_SIZE])
+            page = self.env.cr.fetchall()
+            if not page:
+                return
+            for row in page:
+                _picking_id, name, date_done, carrier_id, waybill, order_name, quoted, booked, invoiced, partial = row
+                status = self._get_status(quoted, booked, invoiced, partial)
+                if self.only_flagged and status != 'variance':
+                    continue
+                compare_quote = quoted and not partial
+                yield [
+                    name, fields.Datetime.to_string(date_done), carrier_names.get(carrier_id, ''), waybill,
+                    order_name or '', quoted, booked, invoiced,
+                    round(booked - quoted, 2) if compare_quote and booked else '',
+                    round(invoiced - booked, 2) if invoiced and booked else '',
+                    round(invoiced - quoted, 2) if compare_quote and invoiced else '',
+                    STATUS_LABELS[status],
+                ]
+            last_id = page[-1][0]
+
+    # --- Streaming exports ---
+
+    def _stream_csv(self):
+        """Yield the CSV export as UTF-8 chunks."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write('\ufeff')
+        writer.writerow(EXPORT_HEADER)
+        for row in self._iter_rows():
+            writer.writerow(row)
+            if buffer.tell() >= STREAM_CHUNK_SIZE:
+                yield buffer.getvalue().encode('utf-8')
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode('utf-8')
+
+    def _stream_xlsx(self):
+        """Yield the XLSX export in chunks.
+
+        xlsxwriter's ``constant_memory`` mode flushes each row to a temporary
+        file as it is written, and the finished workbook is read back from
+        disk chunk by chunk.
+        """
+        with tempfile.TemporaryFile() as output:
+            workbook = xlsxwriter.Workbook(output, {'constant_memory': True, 'tmpdir': tempfile.gettempdir()})
+            sheet = workbook.add_worksheet(_("Reconciliation"))
+            bold = workbook.add_format({'bold': True})
+            money = workbook.add_format({'num_format': '#,##0.00'})
+            sheet.write_row(0, 0, EXPORT_HEADER, bold)
+            for row_index, row in enumerate(self._iter_rows(), start=1):
+                sheet.write_row(row_index, 0, row[:5])
+                for col in AMOUNT_COLUMNS:
+                    if row[col] != '':
+                        sheet.write_number(row_index, col, row[col], money)
+                sheet.write(row_index, AMOUNT_COLUMNS.stop, row[AMOUNT_COLUMNS.stop])
+            workbook.close()
+            output.seek(0)
+            while True:
+                chunk = output.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk